@@ -1,24 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import hmac
 import secrets
 
+from ..config import settings
 from ..database import get_db
 from ..models import User
 from ..schemas import (
     UserCreate,
-    UserResponse,
     LoginInit,
     LoginInitResponse,
     LoginRequest,
     LoginResponse,
     TokenRefresh,
     TokenResponse,
+    UserResponse,
 )
 from ..utils.security import create_access_token, create_refresh_token, verify_token
 
 router = APIRouter()
 
+# Built once at import; SQLAlchemy's compiled cache then hits on every call
+_SELECT_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+_SELECT_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+# Key for the fake login salts, derived once from the secret key so the
+# HMAC below can't be used as an oracle for the key that signs the JWTs
+_FAKE_SALT_KEY = hmac.new(settings.secret_key.encode(), b"login-init-fake-salt", hashlib.sha256).digest()
+
 
 @router.post("/signup", response_model=LoginResponse)
 async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
@@ -26,14 +38,6 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     Register a new user.
     Client generates RSA keypair and encrypts private key before sending.
     """
-    # Check if username exists
-    result = await db.execute(select(User).where(User.username == user_data.username))
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-
     # Create user with CSR
     user = User(
         username=user_data.username,
@@ -45,8 +49,17 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         certificate_status="pending",
     )
 
+    # The unique username constraint is the source of truth; no pre-check
+    # query, and two concurrent signups can't both succeed
     db.add(user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
     await db.refresh(user)
 
     # Generate tokens
@@ -56,7 +69,7 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     return LoginResponse(
         access_token=access_token,
         refresh_token=refresh_token,
-        user=UserResponse.model_validate(user),
+        user=UserResponse.from_orm_fast(user),
         encrypted_private_key=user.encrypted_private_key,
         certificate_status=user.certificate_status or "pending",
         certificate=user.certificate,
@@ -68,12 +81,14 @@ async def login_init(data: LoginInit, db: AsyncSession = Depends(get_db)):
     """
     Initialize login by returning the user's salt for client-side password hashing.
     """
-    result = await db.execute(select(User).where(User.username == data.username))
+    result = await db.execute(_SELECT_USER_BY_USERNAME, {"username": data.username})
     user = result.scalar_one_or_none()
 
     if not user:
-        # Return fake salt to prevent username enumeration
-        fake_salt = secrets.token_hex(16)
+        # Return fake salt to prevent username enumeration. Derived from the
+        # username so it is stable across probes (a random one would change on
+        # every call and give away that the user doesn't exist).
+        fake_salt = hmac.new(_FAKE_SALT_KEY, data.username.encode(), hashlib.sha256).hexdigest()[:32]
         return LoginInitResponse(salt=fake_salt, exists=False)
 
     return LoginInitResponse(salt=user.salt)
@@ -84,7 +99,7 @@ async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """
     Authenticate user and return JWT tokens + encrypted private key.
     """
-    result = await db.execute(select(User).where(User.username == data.username))
+    result = await db.execute(_SELECT_USER_BY_USERNAME, {"username": data.username})
     user = result.scalar_one_or_none()
 
     if not user:
@@ -107,7 +122,7 @@ async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     return LoginResponse(
         access_token=access_token,
         refresh_token=refresh_token,
-        user=UserResponse.model_validate(user),
+        user=UserResponse.from_orm_fast(user),
         encrypted_private_key=user.encrypted_private_key,
         requires_key_migration=user.requires_key_migration,
         certificate_status=user.certificate_status or "none",
@@ -130,7 +145,7 @@ async def refresh_token(data: TokenRefresh, db: AsyncSession = Depends(get_db)):
     user_id = payload.get("sub")
 
     # Verify user still exists
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(_SELECT_USER_BY_ID, {"user_id": user_id})
     user = result.scalar_one_or_none()
 
     if not user:
@@ -1,15 +1,17 @@
 """Certificate Authority API endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
+from sqlalchemy.orm import load_only
 from typing import Optional
 from datetime import datetime
+import orjson
 
 from ..database import get_db
 from ..models import User
-from ..utils.security import get_current_user
+from ..schemas import BaseSchema
+from ..utils.security import get_current_user, get_current_user_id
 from ..utils.certificate import (
     get_ca_certificate_pem,
     verify_certificate,
@@ -20,28 +22,31 @@ from ..utils.certificate import (
 
 router = APIRouter()
 
+# Pre-encoded /ca response body; the CA certificate never changes at runtime
+_ca_response_body: Optional[bytes] = None
 
-class CACertificateResponse(BaseModel):
+
+class CACertificateResponse(BaseSchema):
     certificate: str
 
 
-class CSRResponse(BaseModel):
+class CSRResponse(BaseSchema):
     csr: str
     username: str
 
 
-class CertificateUpload(BaseModel):
+class CertificateUpload(BaseSchema):
     certificate: str  # PEM-encoded signed certificate
 
 
-class CertificateStatusResponse(BaseModel):
+class CertificateStatusResponse(BaseSchema):
     status: str  # none, pending, active, expired, revoked
     expires_at: Optional[datetime] = None
     serial: Optional[str] = None
     subject: Optional[str] = None
 
 
-class UserCertificateResponse(BaseModel):
+class UserCertificateResponse(BaseSchema):
     user_id: str
     username: str
     certificate: str
@@ -55,9 +60,11 @@ async def get_ca_certificate():
     Download the CA certificate (public).
     This is needed by clients to verify other users' certificates.
     """
+    global _ca_response_body
     try:
-        cert_pem = get_ca_certificate_pem()
-        return CACertificateResponse(certificate=cert_pem)
+        if _ca_response_body is None:
+            _ca_response_body = orjson.dumps({"certificate": get_ca_certificate_pem()})
+        return Response(content=_ca_response_body, media_type="application/json")
     except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -67,21 +74,33 @@ async def get_ca_certificate():
 
 @router.get("/my-csr", response_model=CSRResponse)
 async def get_my_csr(
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get the current user's CSR.
     Returns 404 if no CSR exists.
     """
-    if not current_user.csr:
+    result = await db.execute(
+        select(User.csr, User.username).where(User.id == current_user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if not row.csr:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No CSR found for this user"
         )
 
     return CSRResponse(
-        csr=current_user.csr,
-        username=current_user.username
+        csr=row.csr,
+        username=row.username
     )
 
 
@@ -152,14 +171,30 @@ async def upload_certificate(
 
 @router.get("/status", response_model=CertificateStatusResponse)
 async def get_certificate_status(
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get the current user's certificate status."""
-    # Check if certificate has expired since last check
+    result = await db.execute(
+        select(
+            User.certificate_status,
+            User.certificate_expires_at,
+            User.certificate_serial,
+        ).where(User.id == current_user_id)
+    )
+    current_user = result.one_or_none()
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Check if certificate has expired since last check (expiry is stored at upload)
     if (
         current_user.certificate_status == "active"
-        and current_user.certificate
-        and is_certificate_expired(current_user.certificate)
+        and current_user.certificate_expires_at is not None
+        and current_user.certificate_expires_at < datetime.utcnow()
     ):
         # Note: We don't update the DB here to avoid side effects on GET
         return CertificateStatusResponse(
@@ -178,14 +213,24 @@ async def get_certificate_status(
 @router.get("/user/{user_id}", response_model=UserCertificateResponse)
 async def get_user_certificate(
     user_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get another user's certificate.
     Used for encrypting messages to the recipient and verifying signatures.
     """
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        select(User)
+        .options(load_only(
+            User.id,
+            User.username,
+            User.certificate,
+            User.certificate_status,
+            User.certificate_expires_at,
+        ))
+        .where(User.id == user_id)
+    )
     user = result.scalar_one_or_none()
 
     if not user:
@@ -202,7 +247,7 @@ async def get_user_certificate(
 
     # Check expiration
     status_str = user.certificate_status
-    if is_certificate_expired(user.certificate):
+    if user.certificate_expires_at is not None and user.certificate_expires_at < datetime.utcnow():
         status_str = "expired"
 
     return UserCertificateResponse(
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_
-from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy import select, insert, update, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import load_only
+from typing import List, Optional
 from datetime import datetime
+import logging
 
 from ..database import get_db
 from ..models import User, Conversation, Message
+from ..models.timestamps import utc_now
 from ..schemas import (
     ConversationResponse,
     ConversationWithMessages,
@@ -14,56 +18,53 @@ from ..schemas import (
     MessageResponse,
     UserResponse,
 )
-from ..utils.security import get_current_user
-from ..utils.crypto import encrypt_message, decrypt_message
+from ..utils.security import get_current_user_id
+from ..utils.crypto import encrypt_message, decrypt_messages_batch
+from .users import USER_RESPONSE_COLUMNS
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.get("", response_model=List[ConversationResponse])
 async def list_conversations(
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """List all conversations for the current user."""
+    # Join the other participant directly so everything comes back in one query
     result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.participant1), selectinload(Conversation.participant2))
+        select(Conversation, User)
+        .join(User, User.id == Conversation.other_participant_id(current_user_id))
+        .options(load_only(*USER_RESPONSE_COLUMNS))
         .where(
             or_(
-                Conversation.participant1_id == current_user.id,
-                Conversation.participant2_id == current_user.id,
+                Conversation.participant1_id == current_user_id,
+                Conversation.participant2_id == current_user_id,
             )
         )
         .order_by(Conversation.updated_at.desc())
     )
-    conversations = result.scalars().all()
 
-    response = []
-    for conv in conversations:
-        other = conv.get_other_participant(current_user.id)
-        conv_response = ConversationResponse.model_validate(conv)
-        conv_response.other_participant = UserResponse.model_validate(other)
-        response.append(conv_response)
-
-    return response
+    return [
+        ConversationResponse.from_orm_fast(
+            conv, other_participant=UserResponse.from_orm_fast(other)
+        )
+        for conv, other in result.all()
+    ]
 
 
 @router.post("/with/{user_id}", response_model=ConversationResponse)
 async def get_or_create_conversation(
     user_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """Get or create a conversation with another user."""
-    if user_id == current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot create conversation with yourself"
-        )
-
     # Check if other user exists
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        select(User).options(load_only(*USER_RESPONSE_COLUMNS)).where(User.id == user_id)
+    )
     other_user = result.scalar_one_or_none()
 
     if not other_user:
@@ -72,46 +73,35 @@ async def get_or_create_conversation(
             detail="User not found"
         )
 
-    # Check for existing conversation
-    result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.participant1), selectinload(Conversation.participant2))
-        .where(
-            or_(
-                and_(
-                    Conversation.participant1_id == current_user.id,
-                    Conversation.participant2_id == user_id,
-                ),
-                and_(
-                    Conversation.participant1_id == user_id,
-                    Conversation.participant2_id == current_user.id,
-                ),
-            )
-        )
-    )
-    conversation = result.scalar_one_or_none()
-
-    if not conversation:
-        # Create new conversation
-        conversation = Conversation(
-            participant1_id=current_user.id,
-            participant2_id=user_id,
+    # Compared after the lookup, which canonicalises the id (a differently
+    # formatted path value can still resolve to the current user)
+    if other_user.id == current_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot create conversation with yourself"
         )
-        db.add(conversation)
-        await db.commit()
-        await db.refresh(conversation)
 
-        # Load relationships
-        result = await db.execute(
-            select(Conversation)
-            .options(selectinload(Conversation.participant1), selectinload(Conversation.participant2))
-            .where(Conversation.id == conversation.id)
+    # Participants are stored in sorted order so each pair maps to exactly one
+    # row; the upsert returns the existing conversation or creates it atomically.
+    # other_user.id is used rather than the path value so the id is canonical
+    participant1_id, participant2_id = sorted((current_user_id, other_user.id))
+    dialect_insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    result = await db.execute(
+        dialect_insert(Conversation)
+        .values(participant1_id=participant1_id, participant2_id=participant2_id)
+        .on_conflict_do_update(
+            index_elements=[Conversation.participant1_id, Conversation.participant2_id],
+            set_={"updated_at": Conversation.updated_at},
         )
-        conversation = result.scalar_one()
+        .returning(Conversation)
+        .execution_options(populate_existing=True)
+    )
+    conversation = result.scalar_one()
+    await db.commit()
 
-    conv_response = ConversationResponse.model_validate(conversation)
-    conv_response.other_participant = UserResponse.model_validate(other_user)
-    return conv_response
+    return ConversationResponse.from_orm_fast(
+        conversation, other_participant=UserResponse.from_orm_fast(other_user)
+    )
 
 
 @router.get("/{conversation_id}", response_model=ConversationWithMessages)
@@ -119,80 +109,75 @@ async def get_conversation(
     conversation_id: str,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    current_user: User = Depends(get_current_user),
+    before: Optional[datetime] = Query(None),
+    before_id: Optional[str] = Query(None),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get conversation with messages (decrypted)."""
+    """
+    Get conversation with messages (decrypted).
+    Pass `before` and `before_id` (the created_at and id of the oldest message
+    already loaded) to page backwards through history; `offset` is still
+    accepted but scales with depth.
+    """
+    # Only the other participant is needed, joined in the same query
     result = await db.execute(
-        select(Conversation)
-        .options(
-            selectinload(Conversation.participant1),
-            selectinload(Conversation.participant2),
-        )
+        select(Conversation, User)
+        .join(User, User.id == Conversation.other_participant_id(current_user_id))
+        .options(load_only(*USER_RESPONSE_COLUMNS))
         .where(Conversation.id == conversation_id)
     )
-    conversation = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if not conversation:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
+    conversation, other = row
 
     # Verify user is participant
-    if conversation.participant1_id != current_user.id and conversation.participant2_id != current_user.id:
+    if conversation.participant1_id != current_user_id and conversation.participant2_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not a participant in this conversation"
         )
 
-    # Get messages with pagination
+    # Get messages with pagination (keyset on (created_at, id) when `before`
+    # is given; id breaks ties between messages with the same timestamp)
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None and before_id is not None:
+        query = query.where(tuple_(Message.created_at, Message.id) < (before, before_id))
+    elif before is not None:
+        query = query.where(Message.created_at < before)
+    elif offset:
+        query = query.offset(offset)
     result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.desc())
-        .limit(limit)
-        .offset(offset)
+        query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
     )
     messages = result.scalars().all()
 
-    print(f"Fetched {len(messages)} messages for conversation {conversation_id}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Fetched {len(messages)} messages for conversation {conversation_id}")
 
     # Reverse to get chronological order
     messages = list(reversed(messages))
 
-    # Decrypt messages
-    decrypted_messages = []
-    for msg in messages:
-        try:
-            plaintext = decrypt_message(msg.ciphertext, msg.nonce)
-            decrypted_messages.append(MessageResponse(
-                id=msg.id,
-                conversation_id=msg.conversation_id,
-                sender_id=msg.sender_id,
-                content=plaintext,
-                created_at=msg.created_at,
-            ))
-        except Exception as e:
+    # Decrypt messages in one batch with the shared cipher
+    plaintexts = decrypt_messages_batch([(msg.ciphertext, msg.nonce) for msg in messages])
+    decrypted_messages = [
+        MessageResponse.from_orm_fast(
+            msg,
             # If decryption fails, return a placeholder
-            decrypted_messages.append(MessageResponse(
-                id=msg.id,
-                conversation_id=msg.conversation_id,
-                sender_id=msg.sender_id,
-                content="[Message could not be decrypted]",
-                created_at=msg.created_at,
-            ))
-
-    other = conversation.get_other_participant(current_user.id)
-
-    # Build response manually to avoid SQLAlchemy lazy loading issues
-    return ConversationWithMessages(
-        id=conversation.id,
-        participant1_id=conversation.participant1_id,
-        participant2_id=conversation.participant2_id,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        other_participant=UserResponse.model_validate(other),
+            content=plaintext if plaintext is not None else "[Message could not be decrypted]",
+        )
+        for msg, plaintext in zip(messages, plaintexts)
+    ]
+
+    # messages is passed explicitly so the ORM relationship is never lazy-loaded
+    return ConversationWithMessages.from_orm_fast(
+        conversation,
+        other_participant=UserResponse.from_orm_fast(other),
         messages=decrypted_messages,
     )
 
@@ -201,7 +186,7 @@ async def get_conversation(
 async def send_message(
     conversation_id: str,
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -209,47 +194,60 @@ async def send_message(
     This is a fallback for when WebSocket is not available.
     Prefer using Socket.IO for real-time messaging.
     """
-    # Verify conversation exists and user is participant
+    # Encrypt message on server
+    ciphertext, nonce = encrypt_message(message_data.content)
+
+    # Bump the conversation timestamp (stamped by the database: utc_now renders
+    # now(), or a sub-second strftime on SQLite); the participant check is part
+    # of the WHERE clause, so no separate SELECT is needed on the happy path
     result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .where(
+            or_(
+                Conversation.participant1_id == current_user_id,
+                Conversation.participant2_id == current_user_id,
+            )
+        )
+        .values(updated_at=utc_now())
+        .returning(Conversation.id)
+        .execution_options(synchronize_session=False)
     )
-    conversation = result.scalar_one_or_none()
 
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
+    if result.scalar_one_or_none() is None:
+        # Nothing updated: work out whether the conversation exists at all
+        result = await db.execute(
+            select(Conversation.id).where(Conversation.id == conversation_id)
         )
-
-    if conversation.participant1_id != current_user.id and conversation.participant2_id != current_user.id:
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not a participant in this conversation"
         )
 
-    # Encrypt message on server
-    ciphertext, nonce = encrypt_message(message_data.content)
-
-    # Create message
-    message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        ciphertext=ciphertext,
-        nonce=nonce,
+    # Create message; RETURNING gives back the generated fields without a refresh
+    result = await db.execute(
+        insert(Message)
+        .values(
+            conversation_id=conversation_id,
+            sender_id=current_user_id,
+            ciphertext=ciphertext,
+            nonce=nonce,
+        )
+        .returning(Message.id, Message.created_at)
     )
-
-    db.add(message)
-
-    # Update conversation timestamp
-    conversation.updated_at = datetime.utcnow()
+    message_id, created_at = result.one()
 
     await db.commit()
-    await db.refresh(message)
 
     return MessageResponse(
-        id=message.id,
-        conversation_id=message.conversation_id,
-        sender_id=message.sender_id,
+        id=message_id,
+        conversation_id=conversation_id,
+        sender_id=current_user_id,
         content=message_data.content,  # Return original plaintext
-        created_at=message.created_at,
+        created_at=created_at,
     )
@@ -1,61 +1,84 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from sqlalchemy.orm import load_only
+from typing import List, Optional
 
 from ..database import get_db
 from ..models import User
 from ..schemas import UserResponse, UserPublicKey
-from ..utils.security import get_current_user
+from ..utils.security import get_current_user, get_current_user_id
 
 router = APIRouter()
 
+# Columns needed to build a UserResponse; skips key material, hashes and CSRs
+USER_RESPONSE_COLUMNS = (
+    User.id,
+    User.username,
+    User.public_key,
+    User.is_online,
+    User.created_at,
+    User.last_seen,
+    User.certificate_status,
+    User.certificate,
+)
+
 
 @router.get("", response_model=List[UserResponse])
 async def list_users(
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Username of the last user on the previous page"),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all users except the current user."""
-    result = await db.execute(
-        select(User).where(User.id != current_user.id).order_by(User.username)
+    """List users except the current user, ordered by username (keyset-paginated)."""
+    query = (
+        select(User)
+        .options(load_only(*USER_RESPONSE_COLUMNS))
+        .where(User.id != current_user_id)
     )
+    if cursor is not None:
+        query = query.where(User.username > cursor)
+    result = await db.execute(query.order_by(User.username).limit(limit))
     users = result.scalars().all()
-    return [UserResponse.model_validate(u) for u in users]
+    return [UserResponse.from_orm_fast(u) for u in users]
 
 
 @router.get("/search", response_model=List[UserResponse])
 async def search_users(
     q: str = Query(..., min_length=1),
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """Search users by username."""
     result = await db.execute(
         select(User)
-        .where(User.id != current_user.id)
+        .options(load_only(*USER_RESPONSE_COLUMNS))
+        .where(User.id != current_user_id)
         .where(User.username.ilike(f"%{q}%"))
         .order_by(User.username)
         .limit(20)
     )
     users = result.scalars().all()
-    return [UserResponse.model_validate(u) for u in users]
+    return [UserResponse.from_orm_fast(u) for u in users]
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_me(current_user: User = Depends(get_current_user)):
     """Get current user profile."""
-    return UserResponse.model_validate(current_user)
+    return UserResponse.from_orm_fast(current_user)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """Get user by ID."""
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        select(User).options(load_only(*USER_RESPONSE_COLUMNS)).where(User.id == user_id)
+    )
     user = result.scalar_one_or_none()
 
     if not user:
@@ -64,18 +87,20 @@ async def get_user(
             detail="User not found"
         )
 
-    return UserResponse.model_validate(user)
+    return UserResponse.from_orm_fast(user)
 
 
 @router.get("/{user_id}/public-key", response_model=UserPublicKey)
 async def get_user_public_key(
     user_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     """Get user's public key for encryption."""
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    result = await db.execute(
+        select(User.id, User.username, User.public_key).where(User.id == user_id)
+    )
+    user = result.one_or_none()
 
     if not user:
         raise HTTPException(
@@ -83,4 +108,4 @@ async def get_user_public_key(
             detail="User not found"
         )
 
-    return UserPublicKey.model_validate(user)
+    return UserPublicKey.from_orm_fast(user)
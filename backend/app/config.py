@@ -1,15 +1,22 @@
 from typing import List
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
 from functools import lru_cache
 
 
+# URL scheme prefixes rewritten to the async driver
+_REPLACER = {
+    "postgres://": "postgresql+asyncpg://",
+    "postgresql://": "postgresql+asyncpg://",
+}
+
+
+@lru_cache(maxsize=8)
 def convert_database_url(url: str) -> str:
     """Convert postgres:// to postgresql+asyncpg:// for async SQLAlchemy."""
-    if url.startswith("postgres://"):
-        return url.replace("postgres://", "postgresql+asyncpg://", 1)
-    elif url.startswith("postgresql://") and "+asyncpg" not in url:
-        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    for prefix, replacement in _REPLACER.items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
     return url
 
 
@@ -19,6 +26,10 @@ class Settings(BaseSettings):
 
     # Database - pydantic will load DATABASE_URL from env, validator converts it
     database_url: str = "sqlite+aiosqlite:///./crypto_chat.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800  # Seconds before a pooled connection is replaced
 
     # JWT
     secret_key: str = "your-secret-key-change-in-production"
@@ -28,6 +39,11 @@ class Settings(BaseSettings):
 
     # CORS - allow all origins for tunnel testing
     allowed_origins: List[str] = ["*"]
+    cors_max_age: int = 86400  # Seconds browsers may cache a preflight response
+
+    # Socket.IO packet encoding: "json" (orjson) or "msgpack". msgpack is
+    # smaller and faster but every client must use socket.io-msgpack-parser
+    socketio_serializer: str = "json"
 
     @field_validator("database_url", mode="after")
     @classmethod
@@ -35,10 +51,13 @@ class Settings(BaseSettings):
         """Convert postgres:// URLs to async driver format after pydantic loads them."""
         return convert_database_url(v)
 
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
 
 
 @lru_cache()
 def get_settings() -> Settings:
     return Settings()
+
+
+# Process-wide settings; import this rather than calling get_settings() per module
+settings = get_settings()
@@ -1,15 +1,35 @@
+import logging
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from .config import get_settings
-
-settings = get_settings()
-
-print(f"Database URL: {settings.database_url}")
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+engine_options = {}
+if not settings.database_url.startswith("sqlite"):
+    # Size the pool for concurrent requests; SQLite keeps its default pool.
+    # Connections are recycled (and kept alive server-side) instead of being
+    # pinged before every checkout
+    engine_options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=False,
+    )
+if settings.database_url.startswith("postgresql+asyncpg"):
+    engine_options["connect_args"] = {
+        # JIT compilation only slows down the short OLTP queries this app runs
+        "server_settings": {"jit": "off", "tcp_keepalives_idle": "60"},
+        "statement_cache_size": 1024,
+    }
 
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
     future=True,
+    **engine_options,
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -30,5 +50,6 @@ async def get_db() -> AsyncSession:
 
 
 async def init_db():
+    logger.info(f"Database URL: {engine.url.render_as_string(hide_password=True)}")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -1,60 +1,87 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 import socketio
 import asyncio
 import httpx
+import logging
+import queue
 import os
 
-from .config import get_settings
+from .config import settings
 from .database import init_db, engine
 from .api import api_router
-from .socket import sio
+from .socket import sio, flush_presence, presence_flush_loop
 from .migrations import run_migrations
 
-settings = get_settings()
+# Log records are queued and written by a background thread, so request
+# handlers never block on stdout; the listener runs for the app's lifespan
+_log_queue = queue.Queue(-1)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[QueueHandler(_log_queue)],
+)
+log_listener = QueueListener(_log_queue, logging.StreamHandler(), respect_handler_level=True)
+logger = logging.getLogger(__name__)
 
 # Keep-alive task to prevent Render free tier from spinning down
 keep_alive_task = None
+keep_alive_client = None
+presence_task = None
+
+# The 10 minute gap between pings outlives any keep-alive connection, so each
+# ping reconnects; keep the timeouts short and retry a failed connect once
+KEEP_ALIVE_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
 
-async def keep_alive():
+async def keep_alive(client: httpx.AsyncClient):
     """Ping self every 10 minutes to keep the server warm on Render free tier."""
     # Get the app URL from environment or use default
     app_url = os.getenv("RENDER_EXTERNAL_URL") or os.getenv("APP_URL")
 
     if not app_url:
-        print("Keep-alive: No APP_URL or RENDER_EXTERNAL_URL set, skipping self-ping")
+        logger.warning("Keep-alive: No APP_URL or RENDER_EXTERNAL_URL set, skipping self-ping")
         return
 
     health_url = f"{app_url}/health"
-    print(f"Keep-alive: Starting self-ping to {health_url}")
+    logger.info(f"Keep-alive: Starting self-ping to {health_url}")
 
-    async with httpx.AsyncClient() as client:
-        while True:
-            try:
-                await asyncio.sleep(600)  # 10 minutes
-                response = await client.get(health_url, timeout=30)
-                print(f"Keep-alive: Pinged {health_url} - Status: {response.status_code}")
-            except asyncio.CancelledError:
-                print("Keep-alive: Task cancelled")
-                break
-            except Exception as e:
-                print(f"Keep-alive: Ping failed - {e}")
+    while True:
+        try:
+            await asyncio.sleep(600)  # 10 minutes
+            # Hard cap per ping so a stuck request can't leak into the next cycle
+            response = await asyncio.wait_for(client.get(health_url), timeout=10)
+            logger.info(f"Keep-alive: Pinged {health_url} - Status: {response.status_code}")
+        except asyncio.CancelledError:
+            logger.info("Keep-alive: Task cancelled")
+            break
+        except Exception as e:
+            logger.warning(f"Keep-alive: Ping failed - {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global keep_alive_task
+    global keep_alive_task, keep_alive_client, presence_task
 
     # Startup
+    log_listener.start()
     await init_db()
-    print("Database initialized")
+    logger.info("Database initialized")
 
     # Run migrations to add any missing columns
     await run_migrations(engine)
 
     # Start keep-alive background task
-    keep_alive_task = asyncio.create_task(keep_alive())
+    keep_alive_client = httpx.AsyncClient(
+        timeout=KEEP_ALIVE_TIMEOUT,
+        transport=httpx.AsyncHTTPTransport(retries=1),
+    )
+    keep_alive_task = asyncio.create_task(keep_alive(keep_alive_client))
+
+    # Start batched presence writes for Socket.IO connect/disconnect
+    presence_task = asyncio.create_task(presence_flush_loop())
 
     yield
 
@@ -65,7 +92,20 @@ async def lifespan(app: FastAPI):
             await keep_alive_task
         except asyncio.CancelledError:
             pass
-    print("Shutting down")
+    if keep_alive_client:
+        await keep_alive_client.aclose()
+    if presence_task:
+        presence_task.cancel()
+        try:
+            await presence_task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await flush_presence()
+        except Exception as e:
+            logger.error(f"Final presence flush failed: {e}")
+    logger.info("Shutting down")
+    log_listener.stop()
 
 
 app = FastAPI(
@@ -81,14 +121,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.cors_max_age,
 )
 
 # Include REST API routes
 app.include_router(api_router, prefix="/api")
 
-# Mount Socket.IO
-socket_app = socketio.ASGIApp(sio, socketio_path="")
-app.mount("/socket.io", socket_app)
+# Socket.IO wraps the FastAPI app as the outermost ASGI application: its own
+# paths are matched with a single prefix check and everything else (including
+# lifespan) is passed through. Serve this object, not `app`
+application = socketio.ASGIApp(sio, other_asgi_app=app, socketio_path="socket.io")
 
 
 @app.get("/")
@@ -3,34 +3,310 @@ Database migrations for adding new columns.
 Run once on startup to ensure schema is up to date.
 """
 
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncEngine
+import base64
+import logging
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a migration is added below, so existing databases run it once
+SCHEMA_VERSION = 3
+
+
+async def _run_each(engine: AsyncEngine, migrations: list) -> bool:
+    """
+    Run each migration in its own transaction so one failure doesn't abort the rest.
+    Returns True if all of them succeeded.
+    """
+    ok = True
+    for name, migration in migrations:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(migration))
+            logger.info(f"Migration OK: {name}")
+        except Exception as e:
+            logger.error(f"Migration error for {name}: {e}")
+            ok = False
+    return ok
+
+
+async def _get_schema_version(engine: AsyncEngine) -> int:
+    """Read the recorded schema version, creating the schema_meta table if needed."""
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER PRIMARY KEY);"))
+        result = await conn.execute(text("SELECT MAX(version) FROM schema_meta;"))
+        return result.scalar() or 0
+
+
+async def _set_schema_version(engine: AsyncEngine, version: int):
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM schema_meta;"))
+        await conn.execute(text("INSERT INTO schema_meta (version) VALUES (:version);"), {"version": version})
+
+
+async def _existing_columns(conn: AsyncConnection, tables: set) -> set:
+    """Return the (table, column) pairs that already exist for the given tables."""
+    if conn.dialect.name == "sqlite":
+        existing = set()
+        for table in tables:
+            result = await conn.exec_driver_sql(f"PRAGMA table_info({table})")
+            existing.update((table, row[1]) for row in result)
+        return existing
+
+    result = await conn.execute(
+        text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name IN :tables"
+        ).bindparams(bindparam("tables", expanding=True)),
+        {"tables": sorted(tables)},
+    )
+    return {(table, column) for table, column in result}
+
+
+async def _column_type(conn: AsyncConnection, table: str, column: str):
+    """Return the Postgres data_type of a column, or None if it doesn't exist."""
+    result = await conn.execute(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    )
+    return result.scalar_one_or_none()
+
+
+async def _run_conversion(engine: AsyncEngine, name: str, marker: tuple, migrations: list) -> bool:
+    """
+    Run a multi-statement column conversion in a single transaction.
+    marker is (table, column, data_type): the conversion is skipped once that
+    column already has the target type.
+    """
+    table, column, data_type = marker
+    try:
+        async with engine.begin() as conn:
+            if await _column_type(conn, table, column) == data_type:
+                return True
+            for migration in migrations:
+                await conn.execute(text(migration))
+        logger.info(f"Migration OK: {name}")
+        return True
+    except Exception as e:
+        logger.error(f"Migration error for {name}: {e}")
+        return False
+
+
+async def _decode_sqlite_message_blobs(engine: AsyncEngine) -> bool:
+    """
+    SQLite: rewrite base64 text ciphertext/nonce values left by older versions
+    as raw bytes. SQLite columns aren't strictly typed, so no ALTER is needed.
+    """
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("SELECT id, ciphertext, nonce FROM messages WHERE typeof(nonce) = 'text';")
+            )
+            rows = [
+                {"id": id_, "ciphertext": base64.b64decode(ciphertext), "nonce": base64.b64decode(nonce)}
+                for id_, ciphertext, nonce in result
+            ]
+            if rows:
+                await conn.execute(
+                    text("UPDATE messages SET ciphertext = :ciphertext, nonce = :nonce WHERE id = :id;"),
+                    rows,
+                )
+        logger.info(f"Migration OK: binary message columns ({len(rows)} rows)")
+        return True
+    except Exception as e:
+        logger.error(f"Migration error for binary message columns: {e}")
+        return False
+
+
+async def _merge_duplicate_conversations(engine: AsyncEngine) -> bool:
+    """
+    Store participant ids sorted and merge conversations that share a pair, so
+    uq_conversations_participants can be created. The oldest conversation of
+    each pair is kept and the others' messages are moved onto it.
+    """
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "UPDATE conversations SET participant1_id = participant2_id, participant2_id = participant1_id "
+                    "WHERE participant1_id > participant2_id;"
+                )
+            )
+            result = await conn.execute(
+                text(
+                    "SELECT c.id, c.participant1_id, c.participant2_id, c.updated_at FROM conversations c "
+                    "JOIN (SELECT participant1_id, participant2_id FROM conversations "
+                    "GROUP BY participant1_id, participant2_id HAVING COUNT(*) > 1) d "
+                    "ON c.participant1_id = d.participant1_id AND c.participant2_id = d.participant2_id "
+                    "ORDER BY c.created_at, c.id;"
+                )
+            )
+            keep = {}  # (participant1_id, participant2_id) -> [id, latest updated_at]
+            duplicates = []
+            for id_, participant1_id, participant2_id, updated_at in result:
+                survivor = keep.setdefault((participant1_id, participant2_id), [id_, updated_at])
+                if survivor[0] == id_:
+                    continue
+                duplicates.append({"id": id_, "keep": survivor[0]})
+                if updated_at is not None and (survivor[1] is None or updated_at > survivor[1]):
+                    survivor[1] = updated_at
+            if duplicates:
+                await conn.execute(
+                    text("UPDATE messages SET conversation_id = :keep WHERE conversation_id = :id;"),
+                    duplicates,
+                )
+                await conn.execute(text("DELETE FROM conversations WHERE id = :id;"), [{"id": d["id"]} for d in duplicates])
+                await conn.execute(
+                    text("UPDATE conversations SET updated_at = :updated_at WHERE id = :id;"),
+                    [{"id": id_, "updated_at": updated_at} for id_, updated_at in keep.values()],
+                )
+        logger.info(f"Migration OK: merge duplicate conversations ({len(duplicates)} merged)")
+        return True
+    except Exception as e:
+        logger.error(f"Migration error for merge duplicate conversations: {e}")
+        return False
 
 
 async def run_migrations(engine: AsyncEngine):
-    """Add missing columns to database tables."""
-    print("Starting database migrations...")
+    """
+    Add missing columns, conversions and indexes to database tables.
+    Skipped entirely once the database records SCHEMA_VERSION.
+    """
+    version = await _get_schema_version(engine)
+    if version >= SCHEMA_VERSION:
+        logger.info(f"Database schema is up to date (version {version})")
+        return
+
+    logger.info("Starting database migrations...")
 
     migrations = [
         # Users table - certificate fields
-        ("users.csr", "ALTER TABLE users ADD COLUMN IF NOT EXISTS csr TEXT;"),
-        ("users.certificate", "ALTER TABLE users ADD COLUMN IF NOT EXISTS certificate TEXT;"),
-        ("users.certificate_status", "ALTER TABLE users ADD COLUMN IF NOT EXISTS certificate_status VARCHAR(20) DEFAULT 'none';"),
-        ("users.certificate_expires_at", "ALTER TABLE users ADD COLUMN IF NOT EXISTS certificate_expires_at TIMESTAMP;"),
-        ("users.certificate_serial", "ALTER TABLE users ADD COLUMN IF NOT EXISTS certificate_serial VARCHAR(50);"),
+        ("users", "csr", "ALTER TABLE users ADD COLUMN csr TEXT;"),
+        ("users", "certificate", "ALTER TABLE users ADD COLUMN certificate TEXT;"),
+        ("users", "certificate_status", "ALTER TABLE users ADD COLUMN certificate_status VARCHAR(20) DEFAULT 'none';"),
+        ("users", "certificate_expires_at", "ALTER TABLE users ADD COLUMN certificate_expires_at TIMESTAMP;"),
+        ("users", "certificate_serial", "ALTER TABLE users ADD COLUMN certificate_serial VARCHAR(50);"),
 
         # Messages table - signature fields
-        ("messages.signature", "ALTER TABLE messages ADD COLUMN IF NOT EXISTS signature TEXT;"),
-        ("messages.encrypted_key_sender", "ALTER TABLE messages ADD COLUMN IF NOT EXISTS encrypted_key_sender TEXT;"),
-        ("messages.encrypted_key_recipient", "ALTER TABLE messages ADD COLUMN IF NOT EXISTS encrypted_key_recipient TEXT;"),
+        ("messages", "signature", "ALTER TABLE messages ADD COLUMN signature TEXT;"),
+        ("messages", "encrypted_key_sender", "ALTER TABLE messages ADD COLUMN encrypted_key_sender TEXT;"),
+        ("messages", "encrypted_key_recipient", "ALTER TABLE messages ADD COLUMN encrypted_key_recipient TEXT;"),
+    ]
+
+    # Postgres: convert id / foreign key columns from varchar(36) to native
+    # uuid. The foreign keys have to be dropped while the types change, so the
+    # whole conversion runs in one transaction and either fully applies or not
+    uuid_migrations = [
+        "ALTER TABLE conversations DROP CONSTRAINT IF EXISTS conversations_participant1_id_fkey;",
+        "ALTER TABLE conversations DROP CONSTRAINT IF EXISTS conversations_participant2_id_fkey;",
+        "ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_conversation_id_fkey;",
+        "ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_sender_id_fkey;",
+        "ALTER TABLE users ALTER COLUMN id TYPE uuid USING id::uuid;",
+        "ALTER TABLE conversations ALTER COLUMN id TYPE uuid USING id::uuid, "
+        "ALTER COLUMN participant1_id TYPE uuid USING participant1_id::uuid, "
+        "ALTER COLUMN participant2_id TYPE uuid USING participant2_id::uuid;",
+        "ALTER TABLE messages ALTER COLUMN id TYPE uuid USING id::uuid, "
+        "ALTER COLUMN conversation_id TYPE uuid USING conversation_id::uuid, "
+        "ALTER COLUMN sender_id TYPE uuid USING sender_id::uuid;",
+        "ALTER TABLE conversations ADD CONSTRAINT conversations_participant1_id_fkey FOREIGN KEY (participant1_id) REFERENCES users (id);",
+        "ALTER TABLE conversations ADD CONSTRAINT conversations_participant2_id_fkey FOREIGN KEY (participant2_id) REFERENCES users (id);",
+        "ALTER TABLE messages ADD CONSTRAINT messages_conversation_id_fkey FOREIGN KEY (conversation_id) REFERENCES conversations (id);",
+        "ALTER TABLE messages ADD CONSTRAINT messages_sender_id_fkey FOREIGN KEY (sender_id) REFERENCES users (id);",
+    ]
+
+    # Postgres: store timestamps as timestamptz (existing naive values are
+    # UTC) and let the database fill them in
+    timestamptz_migrations = [
+        "ALTER TABLE users ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC', "
+        "ALTER COLUMN created_at SET DEFAULT now(), "
+        "ALTER COLUMN last_seen TYPE timestamptz USING last_seen AT TIME ZONE 'UTC', "
+        "ALTER COLUMN last_seen SET DEFAULT now();",
+        "ALTER TABLE conversations ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC', "
+        "ALTER COLUMN created_at SET DEFAULT now(), "
+        "ALTER COLUMN updated_at TYPE timestamptz USING updated_at AT TIME ZONE 'UTC', "
+        "ALTER COLUMN updated_at SET DEFAULT now();",
+        "ALTER TABLE messages ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC', "
+        "ALTER COLUMN created_at SET DEFAULT now();",
+    ]
+
+    # Postgres: store ciphertext/nonce as raw bytes instead of base64 text
+    bytea_migrations = [
+        "ALTER TABLE messages ALTER COLUMN ciphertext TYPE bytea USING decode(ciphertext, 'base64'), "
+        "ALTER COLUMN nonce TYPE bytea USING decode(nonce, 'base64');",
+    ]
+
+    # SQLite: CURRENT_TIMESTAMP defaults stored whole-second text; pad those
+    # values to the microsecond text format used for newer rows so they sort
+    # (as text) consistently
+    sqlite_migrations = [
+        (f"{table}.{column}.microseconds", f"UPDATE {table} SET {column} = {column} || '.000000' WHERE length({column}) = 19;")
+        for table, column in (
+            ("users", "created_at"),
+            ("users", "last_seen"),
+            ("conversations", "created_at"),
+            ("conversations", "updated_at"),
+            ("messages", "created_at"),
+        )
+    ]
+
+    # Data fixes and indexes (each in its own transaction)
+    index_migrations = [
+        ("conversations.uq_conversations_participants", "CREATE UNIQUE INDEX IF NOT EXISTS uq_conversations_participants ON conversations (participant1_id, participant2_id);"),
+        ("conversations.ix_conversations_participant2", "CREATE INDEX IF NOT EXISTS ix_conversations_participant2 ON conversations (participant2_id, participant1_id);"),
+        # Serves the paginated "latest messages in a conversation" query
+        ("messages.ix_messages_conversation_created_id", "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_id ON messages (conversation_id, created_at DESC, id DESC);"),
     ]
 
+    # Postgres-only indexes (a failure, e.g. missing permission for
+    # CREATE EXTENSION, must not abort the rest)
+    postgres_migrations = [
+        # Trigram index so username ILIKE '%q%' search can use an index
+        ("extension.pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm;"),
+        ("users.ix_users_username_trgm", "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops);"),
+    ]
+
+    ok = True
     async with engine.begin() as conn:
-        for name, migration in migrations:
+        # Look up existing columns once so ALTERs (and their table locks) are
+        # only issued for columns that are actually missing
+        existing = await _existing_columns(conn, {table for table, _, _ in migrations})
+        for table, column, migration in migrations:
+            if (table, column) in existing:
+                continue
             try:
                 await conn.execute(text(migration))
-                print(f"Migration OK: {name}")
+                logger.info(f"Migration OK: {table}.{column}")
             except Exception as e:
-                print(f"Migration error for {name}: {e}")
+                logger.error(f"Migration error for {table}.{column}: {e}")
+                ok = False
+
+    if engine.dialect.name == "postgresql":
+        ok &= await _run_conversion(engine, "native uuid ids", ("messages", "sender_id", "uuid"), uuid_migrations)
+        ok &= await _run_conversion(
+            engine,
+            "timestamptz columns",
+            ("messages", "created_at", "timestamp with time zone"),
+            timestamptz_migrations,
+        )
+        ok &= await _run_conversion(engine, "binary message columns", ("messages", "nonce", "bytea"), bytea_migrations)
+    else:
+        ok &= await _decode_sqlite_message_blobs(engine)
+        ok &= await _run_each(engine, sqlite_migrations)
+
+    # Each pair of users must have a single (sorted) row before the unique
+    # index on it can be created
+    ok &= await _merge_duplicate_conversations(engine)
+    ok &= await _run_each(engine, index_migrations)
+
+    if engine.dialect.name == "postgresql":
+        ok &= await _run_each(engine, postgres_migrations)
 
-    print("Database migrations complete!")
+    # Only record the version once everything applied, so failures are retried
+    if ok:
+        await _set_schema_version(engine, SCHEMA_VERSION)
+    logger.info("Database migrations complete!")
@@ -1,29 +1,51 @@
-import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, DateTime, ForeignKey, Index, case
+from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.orm import relationship
 from ..database import Base
+from .ids import GUID, uuid4_str
+from .timestamps import utc_now
 
 
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    participant1_id = Column(String(36), ForeignKey("users.id"), nullable=False)
-    participant2_id = Column(String(36), ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id = Column(GUID(), primary_key=True, default=uuid4_str)
+    participant1_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    participant2_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utc_now(), server_default=utc_now())
+    updated_at = Column(DateTime(timezone=True), default=utc_now(), server_default=utc_now(), onupdate=utc_now())
 
     # Relationships
-    participant1 = relationship("User", foreign_keys=[participant1_id])
-    participant2 = relationship("User", foreign_keys=[participant2_id])
-    messages = relationship("Message", back_populates="conversation", order_by="Message.created_at")
+    # Never lazy-loaded: queries must join or eager-load the users they need
+    participant1 = relationship("User", foreign_keys=[participant1_id], lazy="raise")
+    participant2 = relationship("User", foreign_keys=[participant2_id], lazy="raise")
+    # Messages are always paged with an explicit query; never load them all
+    messages = relationship(
+        "Message", back_populates="conversation", order_by="[Message.created_at, Message.id]", lazy="raise_on_sql"
+    )
 
-    def get_other_participant(self, user_id: str):
-        """Get the other participant in the conversation."""
+    # Participant ids are stored sorted (participant1_id < participant2_id),
+    # so a pair of users can only ever have one conversation
+    __table_args__ = (
+        Index("uq_conversations_participants", "participant1_id", "participant2_id", unique=True),
+        # The unique index above only serves lookups by participant1_id
+        Index("ix_conversations_participant2", "participant2_id", "participant1_id"),
+    )
+
+    @hybrid_method
+    def other_participant_id(self, user_id: str):
+        """Get the id of the other participant in the conversation."""
         if self.participant1_id == user_id:
-            return self.participant2
-        return self.participant1
+            return self.participant2_id
+        return self.participant1_id
+
+    @other_participant_id.expression
+    def other_participant_id(cls, user_id: str):
+        # SQL form, so the other participant can be joined in the same SELECT
+        return case(
+            (cls.participant1_id == user_id, cls.participant2_id),
+            else_=cls.participant1_id,
+        )
 
     def __repr__(self):
         return f"<Conversation {self.id}>"
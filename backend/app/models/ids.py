@@ -0,0 +1,45 @@
+import os
+import uuid
+
+from sqlalchemy import String, Uuid
+from sqlalchemy.types import TypeDecorator
+
+_NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+def uuid4_str() -> str:
+    """
+    Generate a random (version 4) UUID string.
+    Equivalent to str(uuid.uuid4()) but skips building the uuid.UUID object.
+    """
+    b = bytearray(os.urandom(16))
+    b[6] = (b[6] & 0x0F) | 0x40  # version 4
+    b[8] = (b[8] & 0x3F) | 0x80  # RFC 4122 variant
+    h = b.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class GUID(TypeDecorator):
+    """
+    Primary/foreign key type for ids.
+    Stored as a native 16-byte uuid on Postgres and as a 36-char string
+    elsewhere; on the Python side ids are always plain strings.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(Uuid(as_uuid=False))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "postgresql":
+            return value
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            # Malformed ids (e.g. from a URL) can't match any row; bind the nil
+            # uuid instead of letting the cast fail with a server error
+            return _NIL_UUID
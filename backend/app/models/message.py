@@ -1,19 +1,19 @@
-import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from ..database import Base
+from .ids import GUID, uuid4_str
+from .timestamps import utc_now
 
 
 class Message(Base):
     __tablename__ = "messages"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    conversation_id = Column(String(36), ForeignKey("conversations.id"), nullable=False)
-    sender_id = Column(String(36), ForeignKey("users.id"), nullable=False)
-    ciphertext = Column(Text, nullable=False)  # Encrypted content
-    nonce = Column(String(48), nullable=False)  # For decryption
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id = Column(GUID(), primary_key=True, default=uuid4_str)
+    conversation_id = Column(GUID(), ForeignKey("conversations.id"), nullable=False)
+    sender_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
+    ciphertext = Column(LargeBinary, nullable=False)  # Encrypted content (raw AES-GCM output)
+    nonce = Column(LargeBinary, nullable=False)  # 12-byte nonce for decryption
+    created_at = Column(DateTime(timezone=True), default=utc_now(), server_default=utc_now())
 
     # Digital signature fields
     signature = Column(Text, nullable=True)  # RSA-PSS signature (base64)
@@ -24,5 +24,9 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User", back_populates="sent_messages", foreign_keys=[sender_id])
 
+    __table_args__ = (
+        Index("ix_messages_conversation_created_id", conversation_id, created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f"<Message {self.id}>"
@@ -0,0 +1,26 @@
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class utc_now(FunctionElement):
+    """
+    Database-side current timestamp, used as the column default.
+    Renders now() (microsecond precision on Postgres). SQLite's CURRENT_TIMESTAMP
+    only has whole seconds, so there it renders a millisecond strftime padded to
+    the microsecond text format SQLAlchemy writes, keeping text comparisons with
+    bound datetimes consistent.
+    """
+
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _compile_utc_now(element, compiler, **kw):
+    return "now()"
+
+
+@compiles(utc_now, "sqlite")
+def _compile_utc_now_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
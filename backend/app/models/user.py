@@ -1,14 +1,14 @@
-import uuid
-from datetime import datetime
 from sqlalchemy import Column, String, DateTime, Boolean, Text
 from sqlalchemy.orm import relationship
 from ..database import Base
+from .ids import GUID, uuid4_str
+from .timestamps import utc_now
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID(), primary_key=True, default=uuid4_str)
     username = Column(String(50), unique=True, nullable=False, index=True)
     salt = Column(String(64), nullable=False)
     password_hash = Column(String(128), nullable=False)
@@ -16,8 +16,8 @@ class User(Base):
     public_key = Column(Text, nullable=False)
     requires_key_migration = Column(Boolean, default=False)
     is_online = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_seen = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utc_now(), server_default=utc_now())
+    last_seen = Column(DateTime(timezone=True), default=utc_now(), server_default=utc_now())
 
     # Certificate Authority fields
     csr = Column(Text, nullable=True)  # PEM-encoded CSR
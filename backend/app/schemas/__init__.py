@@ -1,3 +1,4 @@
+from .base import BaseSchema, ORMResponse
 from .user import (
     UserCreate,
     UserResponse,
@@ -21,6 +22,8 @@ from .message import (
 )
 
 __all__ = [
+    "BaseSchema",
+    "ORMResponse",
     "UserCreate",
     "UserResponse",
     "UserPublicKey",
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class BaseSchema(BaseModel):
+    """Base for all API schemas."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ORMResponse(BaseSchema):
+    """
+    Base for response models built from trusted database rows.
+    Frozen: instances are built once and only ever serialized.
+    defer_build postpones pydantic-core schema construction until a model is
+    first used. It is limited to response models: FastAPI builds request-body
+    adapters at startup anyway, and deferring those triggers field warnings.
+    """
+
+    model_config = ConfigDict(defer_build=True, frozen=True)
+
+    @classmethod
+    def from_orm_fast(cls, obj, **overrides):
+        """
+        Build the model from an ORM row without running validation.
+        Keyword overrides supply fields the row doesn't have (or replace ones it does).
+        Falls back to model_validate if the model ever defines validators.
+        """
+        data = {
+            name: getattr(obj, name)
+            for name in cls.model_fields
+            if name not in overrides and hasattr(obj, name)
+        }
+        data.update(overrides)
+
+        decorators = cls.__pydantic_decorators__
+        if decorators.field_validators or decorators.model_validators:
+            return cls.model_validate(data)
+        return cls.model_construct(**data)
@@ -1,14 +1,15 @@
-from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional
+from .base import BaseSchema, ORMResponse
+from .message import MessageResponse
 from .user import UserResponse
 
 
-class ConversationCreate(BaseModel):
+class ConversationCreate(BaseSchema):
     participant_id: str
 
 
-class ConversationResponse(BaseModel):
+class ConversationResponse(ORMResponse):
     id: str
     participant1_id: str
     participant2_id: str
@@ -16,23 +17,12 @@ class ConversationResponse(BaseModel):
     updated_at: datetime
     other_participant: Optional[UserResponse] = None
 
-    class Config:
-        from_attributes = True
-
 
-class ConversationWithMessages(BaseModel):
+class ConversationWithMessages(ORMResponse):
     id: str
     participant1_id: str
     participant2_id: str
     created_at: datetime
     updated_at: datetime
     other_participant: Optional[UserResponse] = None
-    messages: List["MessageResponse"] = []
-
-    class Config:
-        from_attributes = True
-
-
-# Avoid circular import
-from .message import MessageResponse
-ConversationWithMessages.model_rebuild()
+    messages: List[MessageResponse] = []
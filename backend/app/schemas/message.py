@@ -1,13 +1,13 @@
-from pydantic import BaseModel
 from datetime import datetime
+from .base import BaseSchema, ORMResponse
 
 
-class MessageCreate(BaseModel):
+class MessageCreate(BaseSchema):
     """Message creation - client sends plaintext, server encrypts."""
     content: str
 
 
-class MessageResponse(BaseModel):
+class MessageResponse(ORMResponse):
     """Message response - server decrypts and returns plaintext."""
     id: str
     conversation_id: str
@@ -15,11 +15,8 @@ class MessageResponse(BaseModel):
     content: str  # Decrypted plaintext
     created_at: datetime
 
-    class Config:
-        from_attributes = True
 
-
-class MessageSocket(BaseModel):
+class MessageSocket(BaseSchema):
     """Message format for Socket.IO events - client sends plaintext."""
     conversation_id: str
     content: str
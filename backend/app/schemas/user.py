@@ -1,18 +1,24 @@
-from pydantic import BaseModel, Field
+from pydantic import StringConstraints
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
+from .base import BaseSchema, ORMResponse
 
+# Upper bounds match the column sizes; salt and hash are lowercase hex from the client KDF
+Username = Annotated[str, StringConstraints(min_length=3, max_length=50)]
+HexSalt = Annotated[str, StringConstraints(min_length=32, max_length=64, pattern=r"^[0-9a-f]+$")]
+HexPasswordHash = Annotated[str, StringConstraints(min_length=64, max_length=128, pattern=r"^[0-9a-f]+$")]
 
-class UserCreate(BaseModel):
-    username: str = Field(..., min_length=3, max_length=50)
-    salt: str = Field(..., min_length=32)
-    password_hash: str = Field(..., min_length=64)
+
+class UserCreate(BaseSchema):
+    username: Username
+    salt: HexSalt
+    password_hash: HexPasswordHash
     encrypted_private_key: str
     public_key: str
     csr: str  # PEM-encoded Certificate Signing Request
 
 
-class UserResponse(BaseModel):
+class UserResponse(ORMResponse):
     id: str
     username: str
     public_key: str
@@ -22,34 +28,28 @@ class UserResponse(BaseModel):
     certificate_status: Optional[str] = "none"
     certificate: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-
 
-class UserPublicKey(BaseModel):
+class UserPublicKey(ORMResponse):
     id: str
     username: str
     public_key: str
 
-    class Config:
-        from_attributes = True
-
 
-class LoginInit(BaseModel):
+class LoginInit(BaseSchema):
     username: str
 
 
-class LoginInitResponse(BaseModel):
+class LoginInitResponse(BaseSchema):
     salt: str
     exists: bool = True
 
 
-class LoginRequest(BaseModel):
+class LoginRequest(BaseSchema):
     username: str
     password_hash: str
 
 
-class LoginResponse(BaseModel):
+class LoginResponse(BaseSchema):
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
@@ -60,11 +60,11 @@ class LoginResponse(BaseModel):
     certificate: Optional[str] = None
 
 
-class TokenRefresh(BaseModel):
+class TokenRefresh(BaseSchema):
     refresh_token: str
 
 
-class TokenResponse(BaseModel):
+class TokenResponse(BaseSchema):
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
@@ -1,3 +1,3 @@
-from .events import sio, socket_app
+from .events import sio, flush_presence, presence_flush_loop
 
-__all__ = ["sio", "socket_app"]
+__all__ = ["sio", "flush_presence", "presence_flush_loop"]
@@ -1,16 +1,20 @@
 import socketio
-from datetime import datetime
+import asyncio
+import logging
+from dataclasses import dataclass
 from typing import Dict, Set, Optional
-from sqlalchemy import select, or_, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, or_, and_
 
 from ..database import AsyncSessionLocal
 from ..models import User, Conversation, Message
+from ..models.timestamps import utc_now
 from ..utils.security import get_user_from_token
 from ..utils.crypto import encrypt_message, decrypt_message
-from ..config import get_settings
+from ..config import settings
+from .serializer import OrjsonSerializer, get_packet_serializer
+
+logger = logging.getLogger(__name__)
 
-settings = get_settings()
 
 # Create Socket.IO server
 sio = socketio.AsyncServer(
@@ -18,25 +22,70 @@ sio = socketio.AsyncServer(
     cors_allowed_origins=settings.allowed_origins,
     logger=settings.debug,
     engineio_logger=settings.debug,
+    serializer=get_packet_serializer(settings.socketio_serializer),
+    json=OrjsonSerializer,
 )
 
-# Create ASGI app
-socket_app = socketio.ASGIApp(sio)
 
-# Store connected users: {user_id: {sid, username}}
-connected_users: Dict[str, Dict] = {}
+@dataclass(slots=True)
+class SocketUser:
+    """An authenticated connection: the fields event handlers need."""
+    id: str
+    username: str
+    sid: str
+
+
+# Store connected users: {user_id: SocketUser} (the user's latest connection)
+connected_users: Dict[str, SocketUser] = {}
+# Reverse index of connected_users: {sid: SocketUser}
+sid_to_user: Dict[str, SocketUser] = {}
 # Store which conversations each sid is in
 sid_conversations: Dict[str, Set[str]] = {}
+# Presence changes not yet written to the database: {user_id: is_online}
+pending_presence: Dict[str, bool] = {}
+
+PRESENCE_FLUSH_INTERVAL = 1.0  # seconds
 
 
-async def get_user_from_sid(sid: str) -> Optional[User]:
-    """Get user from session ID."""
-    for user_id, data in connected_users.items():
-        if data.get("sid") == sid:
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(select(User).where(User.id == user_id))
-                return result.scalar_one_or_none()
-    return None
+def get_user_from_sid(sid: str) -> Optional[SocketUser]:
+    """Get the user authenticated on a session ID (no database access)."""
+    return sid_to_user.get(sid)
+
+
+async def flush_presence():
+    """Write pending is_online/last_seen changes with at most two UPDATEs."""
+    if not pending_presence:
+        return
+    pending = dict(pending_presence)
+    pending_presence.clear()
+
+    try:
+        async with AsyncSessionLocal() as db:
+            for is_online in (True, False):
+                user_ids = [uid for uid, online in pending.items() if online is is_online]
+                if user_ids:
+                    await db.execute(
+                        update(User)
+                        .where(User.id.in_(user_ids))
+                        .values(is_online=is_online, last_seen=utc_now())
+                        .execution_options(synchronize_session=False)
+                    )
+            await db.commit()
+    except Exception:
+        # Put the changes back for the next flush unless newer ones arrived
+        for uid, online in pending.items():
+            pending_presence.setdefault(uid, online)
+        raise
+
+
+async def presence_flush_loop():
+    """Flush batched presence changes every PRESENCE_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(PRESENCE_FLUSH_INTERVAL)
+        try:
+            await flush_presence()
+        except Exception as e:
+            logger.error(f"Presence flush failed: {e}")
 
 
 @sio.event
@@ -45,26 +94,26 @@ async def connect(sid, environ, auth):
     token = auth.get("token") if auth else None
 
     if not token:
-        print(f"Connection rejected: No token provided (sid={sid})")
+        logger.info(f"Connection rejected: No token provided (sid={sid})")
         return False
 
     async with AsyncSessionLocal() as db:
         user = await get_user_from_token(token, db)
 
         if not user:
-            print(f"Connection rejected: Invalid token (sid={sid})")
+            logger.info(f"Connection rejected: Invalid token (sid={sid})")
             return False
 
-        # Update user online status
-        user.is_online = True
-        user.last_seen = datetime.utcnow()
-        await db.commit()
+        # Update user online status (written by the next presence flush)
+        pending_presence[user.id] = True
 
         # Store connection
-        connected_users[user.id] = {"sid": sid, "username": user.username}
+        socket_user = SocketUser(id=user.id, username=user.username, sid=sid)
+        connected_users[user.id] = socket_user
+        sid_to_user[sid] = socket_user
         sid_conversations[sid] = set()
 
-        print(f"User {user.username} connected (sid={sid})")
+        logger.info(f"User {user.username} connected (sid={sid})")
 
         # Notify other users
         await sio.emit(
@@ -79,36 +128,26 @@ async def connect(sid, environ, auth):
 @sio.event
 async def disconnect(sid):
     """Handle client disconnection."""
-    user_id = None
-    username = None
-
-    # Find user by sid
-    for uid, data in list(connected_users.items()):
-        if data.get("sid") == sid:
-            user_id = uid
-            username = data.get("username")
-            del connected_users[uid]
-            break
+    user = sid_to_user.pop(sid, None)
 
     # Clean up conversation rooms
     if sid in sid_conversations:
         del sid_conversations[sid]
 
-    if user_id:
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(select(User).where(User.id == user_id))
-            user = result.scalar_one_or_none()
-            if user:
-                user.is_online = False
-                user.last_seen = datetime.utcnow()
-                await db.commit()
+    # Only treat the user as gone if their entry still points at this
+    # connection; a newer connection from the same user may have replaced it
+    if user is not None and connected_users.get(user.id) is user:
+        del connected_users[user.id]
+
+        # Written by the next presence flush
+        pending_presence[user.id] = False
 
-        print(f"User {username} disconnected (sid={sid})")
+        logger.info(f"User {user.username} disconnected (sid={sid})")
 
         # Notify other users
         await sio.emit(
             "user_offline",
-            {"user_id": user_id, "username": username},
+            {"user_id": user.id, "username": user.username},
             skip_sid=sid,
         )
 
@@ -120,28 +159,30 @@ async def join_conversation(sid, data):
     if not conversation_id:
         return {"error": "conversation_id required"}
 
-    user = await get_user_from_sid(sid)
+    user = get_user_from_sid(sid)
     if not user:
         return {"error": "Not authenticated"}
 
     async with AsyncSessionLocal() as db:
-        # Verify user is participant
+        # Verify user is participant (plain column tuple, no ORM object needed)
         result = await db.execute(
-            select(Conversation).where(Conversation.id == conversation_id)
+            select(Conversation.participant1_id, Conversation.participant2_id)
+            .where(Conversation.id == conversation_id)
         )
-        conversation = result.scalar_one_or_none()
+        participants = result.one_or_none()
 
-        if not conversation:
+        if not participants:
             return {"error": "Conversation not found"}
 
-        if conversation.participant1_id != user.id and conversation.participant2_id != user.id:
+        if user.id not in participants:
             return {"error": "Not a participant"}
 
     # Join the room
     await sio.enter_room(sid, conversation_id)
     sid_conversations[sid].add(conversation_id)
 
-    print(f"User {user.username} joined conversation {conversation_id}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"User {user.username} joined conversation {conversation_id}")
     return {"success": True}
 
 
@@ -174,53 +215,71 @@ async def send_message(sid, data):
     if not conversation_id or not content:
         return {"error": "Missing required fields (conversation_id, content)"}
 
-    user = await get_user_from_sid(sid)
+    user = get_user_from_sid(sid)
     if not user:
         return {"error": "Not authenticated"}
 
     async with AsyncSessionLocal() as db:
-        # Verify conversation and participation
+        # Bump the conversation timestamp (stamped by the database: utc_now
+        # renders now(), or a sub-second strftime on SQLite); the participant
+        # check is part of the WHERE clause and RETURNING gives back the
+        # participants, so no separate SELECT is needed on the happy path
         result = await db.execute(
-            select(Conversation)
-            .options(selectinload(Conversation.participant1), selectinload(Conversation.participant2))
+            update(Conversation)
             .where(Conversation.id == conversation_id)
+            .where(
+                or_(
+                    Conversation.participant1_id == user.id,
+                    Conversation.participant2_id == user.id,
+                )
+            )
+            .values(updated_at=utc_now())
+            .returning(Conversation.participant1_id, Conversation.participant2_id)
+            .execution_options(synchronize_session=False)
         )
-        conversation = result.scalar_one_or_none()
-
-        if not conversation:
-            return {"error": "Conversation not found"}
-
-        if conversation.participant1_id != user.id and conversation.participant2_id != user.id:
+        participants = result.one_or_none()
+
+        if not participants:
+            # Nothing updated: work out whether the conversation exists at all
+            result = await db.execute(
+                select(Conversation.id).where(Conversation.id == conversation_id)
+            )
+            if result.scalar_one_or_none() is None:
+                return {"error": "Conversation not found"}
             return {"error": "Not a participant"}
+        participant1_id, participant2_id = participants
 
         # Encrypt message on server
         ciphertext, nonce = encrypt_message(content)
 
-        # Create message with optional signature fields
-        message = Message(
-            conversation_id=conversation_id,
-            sender_id=user.id,
-            ciphertext=ciphertext,
-            nonce=nonce,
-            signature=signature,
-            encrypted_key_sender=encrypted_key_sender,
-            encrypted_key_recipient=encrypted_key_recipient,
+        # Create message with optional signature fields; RETURNING gives back
+        # the generated fields without a refresh
+        result = await db.execute(
+            insert(Message)
+            .values(
+                conversation_id=conversation_id,
+                sender_id=user.id,
+                ciphertext=ciphertext,
+                nonce=nonce,
+                signature=signature,
+                encrypted_key_sender=encrypted_key_sender,
+                encrypted_key_recipient=encrypted_key_recipient,
+            )
+            .returning(Message.id, Message.created_at)
         )
-
-        db.add(message)
-        conversation.updated_at = datetime.utcnow()
+        message_id, created_at = result.one()
         await db.commit()
-        await db.refresh(message)
 
-        print(f"Message saved: id={message.id}, conversation={conversation_id}, content_length={len(content)}, has_signature={signature is not None}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Message saved: id={message_id}, conversation={conversation_id}, content_length={len(content)}, has_signature={signature is not None}")
 
         # Prepare message data for broadcast (plaintext for clients)
         message_data = {
-            "id": message.id,
-            "conversation_id": message.conversation_id,
-            "sender_id": message.sender_id,
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "sender_id": user.id,
             "content": content,  # Send plaintext to clients
-            "created_at": message.created_at.isoformat(),
+            "created_at": created_at,  # Encoded by the packet serializer
             "signature": signature,  # Include signature for verification
             "encrypted_key_sender": encrypted_key_sender,
             "encrypted_key_recipient": encrypted_key_recipient,
@@ -230,27 +289,22 @@ async def send_message(sid, data):
         await sio.emit("new_message", message_data, room=conversation_id)
 
         # Also notify the other participant if not in the room
-        other_user_id = (
-            conversation.participant2_id
-            if conversation.participant1_id == user.id
-            else conversation.participant1_id
-        )
-
-        if other_user_id in connected_users:
-            other_sid = connected_users[other_user_id]["sid"]
-            if other_sid not in sid_conversations or conversation_id not in sid_conversations.get(other_sid, set()):
-                # User is online but not in this conversation room
-                await sio.emit(
-                    "message_notification",
-                    {
-                        "conversation_id": conversation_id,
-                        "sender_id": user.id,
-                        "sender_username": user.username,
-                    },
-                    to=other_sid,
-                )
-
-        return {"success": True, "message_id": message.id}
+        # (if they are in the room they already got new_message above)
+        other_user_id = participant2_id if participant1_id == user.id else participant1_id
+        other = connected_users.get(other_user_id)
+        if other is not None and conversation_id not in sid_conversations.get(other.sid, ()):
+            # User is online but not in this conversation room
+            await sio.emit(
+                "message_notification",
+                {
+                    "conversation_id": conversation_id,
+                    "sender_id": user.id,
+                    "sender_username": user.username,
+                },
+                to=other.sid,
+            )
+
+        return {"success": True, "message_id": message_id}
 
 
 @sio.event
@@ -260,7 +314,7 @@ async def typing(sid, data):
     if not conversation_id:
         return
 
-    user = await get_user_from_sid(sid)
+    user = get_user_from_sid(sid)
     if not user:
         return
 
@@ -279,7 +333,7 @@ async def stop_typing(sid, data):
     if not conversation_id:
         return
 
-    user = await get_user_from_sid(sid)
+    user = get_user_from_sid(sid)
     if not user:
         return
 
@@ -295,7 +349,7 @@ async def stop_typing(sid, data):
 async def get_online_users(sid, data):
     """Get list of currently online users."""
     online_list = [
-        {"user_id": uid, "username": info["username"]}
+        {"user_id": uid, "username": info.username}
         for uid, info in connected_users.items()
     ]
     return {"online_users": online_list}
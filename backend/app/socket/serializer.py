@@ -0,0 +1,38 @@
+"""Packet serializers for Socket.IO (orjson-backed JSON, optional msgpack)."""
+
+from datetime import datetime
+
+import orjson
+
+
+class OrjsonSerializer:
+    """
+    Drop-in for the stdlib json module as used by python-socketio/engineio.
+    They call dumps(data, separators=...) and expect a str back; orjson
+    output is already compact, so extra keyword arguments are ignored.
+    Datetimes in event payloads are encoded natively as ISO 8601 strings.
+    """
+
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
+def _msgpack_default(obj):
+    """Encode the types msgpack can't handle the same way the JSON path does."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def get_packet_serializer(name: str):
+    """Return the AsyncServer `serializer` argument for a configured name."""
+    if name == "msgpack":
+        from socketio.msgpack_packet import MsgPackPacket
+
+        return MsgPackPacket.configure(dumps_default=_msgpack_default)
+    return "default"
@@ -3,6 +3,7 @@ from .security import (
     create_refresh_token,
     verify_token,
     get_current_user,
+    get_current_user_id,
 )
 
 __all__ = [
@@ -10,4 +11,5 @@ __all__ = [
     "create_refresh_token",
     "verify_token",
     "get_current_user",
+    "get_current_user_id",
 ]
@@ -1,11 +1,13 @@
 """Certificate Authority utilities for certificate verification and management."""
 
 from datetime import datetime
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Optional, Tuple, Union
 from pathlib import Path
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.constant_time import bytes_eq
 from cryptography.x509.oid import NameOID
 from cryptography.exceptions import InvalidSignature
 
@@ -13,21 +15,48 @@ from cryptography.exceptions import InvalidSignature
 CA_CERT_PATH = Path(__file__).parent.parent.parent.parent.parent / "AC1" / "ac1cert.pem"
 
 _ca_certificate: Optional[x509.Certificate] = None
+_ca_public_key: Optional[rsa.RSAPublicKey] = None
+_ca_cert_pem: Optional[str] = None
 
 
 def load_ca_certificate() -> x509.Certificate:
-    """Load and cache the CA certificate."""
-    global _ca_certificate
+    """Load and cache the CA certificate (its PEM text and public key too)."""
+    global _ca_certificate, _ca_public_key, _ca_cert_pem
     if _ca_certificate is None:
         with open(CA_CERT_PATH, "rb") as f:
-            _ca_certificate = x509.load_pem_x509_certificate(f.read())
+            raw = f.read()
+        ca_certificate = x509.load_pem_x509_certificate(raw)
+        # Set the PEM and key first so a reader that sees the certificate also sees them
+        _ca_cert_pem = raw.decode("utf-8")
+        _ca_public_key = ca_certificate.public_key()
+        _ca_certificate = ca_certificate
     return _ca_certificate
 
 
+def get_ca_public_key() -> rsa.RSAPublicKey:
+    """Get the CA public key, decoded from the certificate only once."""
+    if _ca_public_key is None:
+        load_ca_certificate()
+    return _ca_public_key
+
+
+@lru_cache(maxsize=1024)
+def _load_certificate(cert_pem: str) -> x509.Certificate:
+    """Parse a PEM certificate, caching the result for repeated lookups."""
+    return x509.load_pem_x509_certificate(cert_pem.encode())
+
+
+@lru_cache(maxsize=1024)
+def _load_csr(csr_pem: str) -> x509.CertificateSigningRequest:
+    """Parse a PEM CSR, caching the result for repeated lookups."""
+    return x509.load_pem_x509_csr(csr_pem.encode())
+
+
 def get_ca_certificate_pem() -> str:
-    """Get the CA certificate as PEM string."""
-    with open(CA_CERT_PATH, "rb") as f:
-        return f.read().decode("utf-8")
+    """Get the CA certificate as PEM string (read from disk once)."""
+    if _ca_cert_pem is None:
+        load_ca_certificate()
+    return _ca_cert_pem
 
 
 def verify_certificate(cert_pem: str, ca_cert: Optional[x509.Certificate] = None) -> bool:
@@ -42,11 +71,20 @@ def verify_certificate(cert_pem: str, ca_cert: Optional[x509.Certificate] = None
         True if certificate is valid and signed by CA
     """
     if ca_cert is None:
-        ca_cert = load_ca_certificate()
+        get_ca_public_key()
+        return _verify_with_default_ca(cert_pem)
+    return _verify_signature(cert_pem, ca_cert.public_key())
 
+
+@lru_cache(maxsize=1024)
+def _verify_with_default_ca(cert_pem: str) -> bool:
+    """Memoized signature check against the server CA, which is loaded once per process."""
+    return _verify_signature(cert_pem, get_ca_public_key())
+
+
+def _verify_signature(cert_pem: str, ca_public_key: rsa.RSAPublicKey) -> bool:
     try:
-        cert = x509.load_pem_x509_certificate(cert_pem.encode())
-        ca_public_key = ca_cert.public_key()
+        cert = _load_certificate(cert_pem)
 
         # Verify signature
         ca_public_key.verify(
@@ -62,10 +100,16 @@ def verify_certificate(cert_pem: str, ca_cert: Optional[x509.Certificate] = None
 
 def is_certificate_expired(cert_pem: str) -> bool:
     """Check if a certificate has expired."""
-    cert = x509.load_pem_x509_certificate(cert_pem.encode())
+    cert = _load_certificate(cert_pem)
     return datetime.utcnow() > cert.not_valid_after_utc.replace(tzinfo=None)
 
 
+def _common_name(name: x509.Name) -> Optional[str]:
+    """Return the first common name in an x509 Name, or None."""
+    attrs = name.get_attributes_for_oid(NameOID.COMMON_NAME)
+    return attrs[0].value if attrs else None
+
+
 def extract_certificate_info(cert_pem: str) -> dict:
     """
     Extract information from a certificate.
@@ -73,21 +117,11 @@ def extract_certificate_info(cert_pem: str) -> dict:
     Returns:
         dict with: serial, subject, issuer, not_before, not_after, is_expired
     """
-    cert = x509.load_pem_x509_certificate(cert_pem.encode())
-
-    # Extract subject common name
-    subject_cn = None
-    for attr in cert.subject:
-        if attr.oid == NameOID.COMMON_NAME:
-            subject_cn = attr.value
-            break
-
-    # Extract issuer common name
-    issuer_cn = None
-    for attr in cert.issuer:
-        if attr.oid == NameOID.COMMON_NAME:
-            issuer_cn = attr.value
-            break
+    cert = _load_certificate(cert_pem)
+
+    # Extract subject and issuer common names
+    subject_cn = _common_name(cert.subject)
+    issuer_cn = _common_name(cert.issuer)
 
     return {
         "serial": format(cert.serial_number, "x"),
@@ -99,40 +133,43 @@ def extract_certificate_info(cert_pem: str) -> dict:
     }
 
 
-def verify_csr_matches_cert(csr_pem: str, cert_pem: str) -> bool:
+def verify_csr_matches_cert(
+    csr_pem: Union[str, x509.CertificateSigningRequest],
+    cert_pem: Union[str, x509.Certificate],
+) -> bool:
     """
     Verify that a certificate was issued from a specific CSR.
     Checks that the public keys match.
 
     Args:
-        csr_pem: PEM-encoded CSR
-        cert_pem: PEM-encoded certificate
+        csr_pem: PEM-encoded CSR (or an already-parsed CSR)
+        cert_pem: PEM-encoded certificate (or an already-parsed certificate)
 
     Returns:
         True if the certificate's public key matches the CSR's public key
     """
     try:
-        csr = x509.load_pem_x509_csr(csr_pem.encode())
-        cert = x509.load_pem_x509_certificate(cert_pem.encode())
+        csr = _load_csr(csr_pem) if isinstance(csr_pem, str) else csr_pem
+        cert = _load_certificate(cert_pem) if isinstance(cert_pem, str) else cert_pem
 
-        # Compare public keys by serializing them
+        # Compare public keys by their DER SubjectPublicKeyInfo encoding
         csr_pub_bytes = csr.public_key().public_bytes(
-            encoding=serialization.Encoding.PEM,
+            encoding=serialization.Encoding.DER,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
         cert_pub_bytes = cert.public_key().public_bytes(
-            encoding=serialization.Encoding.PEM,
+            encoding=serialization.Encoding.DER,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
 
-        return csr_pub_bytes == cert_pub_bytes
+        return bytes_eq(csr_pub_bytes, cert_pub_bytes)
     except Exception:
         return False
 
 
 def get_public_key_from_certificate(cert_pem: str) -> str:
     """Extract the public key from a certificate as PEM string."""
-    cert = x509.load_pem_x509_certificate(cert_pem.encode())
+    cert = _load_certificate(cert_pem)
     return cert.public_key().public_bytes(
         encoding=serialization.Encoding.PEM,
         format=serialization.PublicFormat.SubjectPublicKeyInfo
@@ -1,8 +1,8 @@
 """Server-side cryptography utilities."""
 
 import os
-import base64
-from typing import Tuple
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
@@ -11,8 +11,9 @@ from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 SERVER_KEY = os.environ.get('ENCRYPTION_KEY', 'default-dev-key-change-in-prod')
 
 
+@lru_cache(maxsize=1)
 def get_encryption_key() -> bytes:
-    """Derive a 256-bit key from the server key."""
+    """Derive a 256-bit key from the server key (Scrypt runs once per process)."""
     kdf = Scrypt(
         salt=b'crypto-chat-salt',
         length=32,
@@ -23,33 +24,43 @@ def get_encryption_key() -> bytes:
     return kdf.derive(SERVER_KEY.encode())
 
 
-def encrypt_message(plaintext: str) -> Tuple[str, str]:
+# Built once at import: the key is derived and the AES-GCM context (key
+# schedule, GHASH tables) set up a single time, then reused for every message
+_AESGCM = AESGCM(get_encryption_key())
+
+
+def encrypt_message(plaintext: str) -> Tuple[bytes, bytes]:
     """
     Encrypt a message using AES-256-GCM.
-    Returns (ciphertext_b64, nonce_b64).
+    Returns raw (ciphertext, nonce) bytes, stored as-is in binary columns.
     """
-    key = get_encryption_key()
-    aesgcm = AESGCM(key)
     nonce = os.urandom(12)
 
-    ciphertext = aesgcm.encrypt(nonce, plaintext.encode('utf-8'), None)
+    ciphertext = _AESGCM.encrypt(nonce, plaintext.encode('utf-8'), None)
 
-    return (
-        base64.b64encode(ciphertext).decode('utf-8'),
-        base64.b64encode(nonce).decode('utf-8')
-    )
+    return ciphertext, nonce
 
 
-def decrypt_message(ciphertext_b64: str, nonce_b64: str) -> str:
+def decrypt_message(ciphertext: bytes, nonce: bytes) -> str:
     """
     Decrypt a message using AES-256-GCM.
     Returns the plaintext string.
     """
-    key = get_encryption_key()
-    aesgcm = AESGCM(key)
+    plaintext = _AESGCM.decrypt(nonce, ciphertext, None)
+    return plaintext.decode('utf-8')
 
-    ciphertext = base64.b64decode(ciphertext_b64)
-    nonce = base64.b64decode(nonce_b64)
 
-    plaintext = aesgcm.decrypt(nonce, ciphertext, None)
-    return plaintext.decode('utf-8')
+def decrypt_messages_batch(items: Iterable[Tuple[bytes, bytes]]) -> List[Optional[str]]:
+    """
+    Decrypt many (ciphertext, nonce) pairs with the shared cipher instance.
+    Returns plaintexts in the same order, with None for any message that fails to decrypt.
+    """
+    decrypt = _AESGCM.decrypt
+
+    plaintexts: List[Optional[str]] = []
+    for ciphertext, nonce in items:
+        try:
+            plaintexts.append(decrypt(nonce, ciphertext, None).decode('utf-8'))
+        except Exception:
+            plaintexts.append(None)
+    return plaintexts
@@ -1,46 +1,116 @@
+import hashlib
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Dict, Optional, Tuple
+import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
 
-from ..config import get_settings
+from ..config import settings
 from ..database import get_db
 from ..models import User
 
-settings = get_settings()
 security = HTTPBearer()
 
+# Signing parameters resolved once; settings are frozen for the process lifetime
+_SECRET = settings.secret_key.encode()
+_ALG = settings.algorithm
+_ACCESS_TTL = timedelta(minutes=settings.access_token_expire_minutes)
+_REFRESH_TTL = timedelta(days=settings.refresh_token_expire_days)
+
+_SELECT_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_SELECT_TOKEN_USER_BY_ID = select(User.id, User.username).where(User.id == bindparam("user_id"))
+
+# Decoded JWT payloads keyed by a digest of the raw token, so repeated requests
+# with the same token skip signature verification until it expires.
+TOKEN_CACHE_MAX_SIZE = 10_000
+# Cached payloads stop being served this many seconds before the token expires
+TOKEN_EXPIRY_MARGIN = 5
+_token_cache: Dict[bytes, dict] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class TokenUser:
+    """The user fields resolved by get_user_from_token."""
+    id: str
+    username: str
+
+
+# Users resolved by get_user_from_token, keyed by id: {user_id: (cached_at, user)}.
+# Short-lived, so reconnect storms don't re-query the same rows.
+USER_CACHE_MAX_SIZE = 10_000
+USER_CACHE_TTL = 10
+_user_cache: Dict[str, Tuple[float, TokenUser]] = {}
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = datetime.utcnow() + _ACCESS_TTL
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    encoded_jwt = jwt.encode(to_encode, _SECRET, algorithm=_ALG)
     return encoded_jwt
 
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    expire = datetime.utcnow() + _REFRESH_TTL
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+    encoded_jwt = jwt.encode(to_encode, _SECRET, algorithm=_ALG)
     return encoded_jwt
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+def _decode_token(token: str) -> Optional[dict]:
+    """Decode a JWT, reusing a cached payload while the token is unexpired."""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    payload = _token_cache.get(key)
+    if payload is not None:
+        if payload["exp"] - TOKEN_EXPIRY_MARGIN > time.time():
+            return payload
+        del _token_cache[key]
+
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        if payload.get("type") != token_type:
-            return None
-        return payload
-    except JWTError:
+        payload = jwt.decode(token, _SECRET, algorithms=[_ALG])
+    except jwt.PyJWTError:
+        return None
+
+    if "exp" in payload:
+        if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+            # Evict the oldest entry (dicts preserve insertion order)
+            del _token_cache[next(iter(_token_cache))]
+        _token_cache[key] = payload
+    return payload
+
+
+def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+    payload = _decode_token(token)
+    if payload is None or payload.get("type") != token_type:
         return None
+    return payload
+
+
+async def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> str:
+    """
+    Resolve the authenticated user's id from the JWT alone (no database hit).
+    Use get_current_user instead when the handler needs the User row.
+    """
+    payload = verify_token(credentials.credentials, "access")
+    user_id = payload.get("sub") if payload is not None else None
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
 
 
 async def get_current_user(
@@ -61,7 +131,7 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(_SELECT_USER_BY_ID, {"user_id": user_id})
     user = result.scalar_one_or_none()
 
     if user is None:
@@ -70,8 +140,11 @@ async def get_current_user(
     return user
 
 
-async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
-    """Get user from token without raising exceptions. Used for Socket.IO auth."""
+async def get_user_from_token(token: str, db: AsyncSession) -> Optional[TokenUser]:
+    """
+    Get user from token without raising exceptions. Used for Socket.IO auth.
+    Only the id and username are loaded (and briefly cached).
+    """
     payload = verify_token(token, "access")
     if payload is None:
         return None
@@ -80,5 +153,18 @@ async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
     if user_id is None:
         return None
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached is not None and now - cached[0] < USER_CACHE_TTL:
+        return cached[1]
+
+    result = await db.execute(_SELECT_TOKEN_USER_BY_ID, {"user_id": user_id})
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    user = TokenUser(id=row.id, username=row.username)
+    if len(_user_cache) >= USER_CACHE_MAX_SIZE and user_id not in _user_cache:
+        del _user_cache[next(iter(_user_cache))]
+    _user_cache[user_id] = (now, user)
+    return user
@@ -10,68 +10,81 @@ On first login in the web app, users will need to re-enter their password to
 re-encrypt their private key in the Web Crypto compatible format.
 """
 
-import json
 import asyncio
 import sys
 from pathlib import Path
 
+import ijson
+
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from app.database import AsyncSessionLocal, init_db
 from app.models import User
 
 
+BATCH_SIZE = 500
+
+
+async def _migrate_batch(db, batch: dict) -> tuple:
+    """Insert one batch of {username: user_data}, skipping existing users. Returns (migrated, skipped)."""
+    # One query finds which usernames in the batch already exist
+    result = await db.execute(select(User.username).where(User.username.in_(list(batch))))
+    existing = set(result.scalars())
+
+    rows = []
+    for username, user_data in batch.items():
+        if username in existing:
+            print(f"Skipping {username}: already exists in database")
+            continue
+        rows.append({
+            "username": username,
+            "salt": user_data.get('salt', ''),
+            "password_hash": user_data.get('password_hash', ''),
+            "encrypted_private_key": user_data.get('encrypted_private_key', ''),
+            "public_key": user_data.get('public_key', ''),
+            "requires_key_migration": True,  # Mark for key re-encryption on first login
+        })
+        print(f"Migrating user: {username}")
+
+    if rows:
+        await db.execute(insert(User), rows)
+    await db.commit()
+    return len(rows), len(existing)
+
+
 async def migrate_users(crypto_json_path: str):
-    """Migrate users from crypto.json to SQLite database."""
+    """Migrate users from crypto.json to the database, streaming the file in batches."""
 
-    # Load existing users
     crypto_path = Path(crypto_json_path)
     if not crypto_path.exists():
         print(f"Error: {crypto_json_path} not found")
         return
 
-    with open(crypto_path, 'r') as f:
-        crypto_data = json.load(f)
-
     # Initialize database
     await init_db()
 
+    migrated = 0
+    skipped = 0
+
     async with AsyncSessionLocal() as db:
-        migrated = 0
-        skipped = 0
-
-        for username, user_data in crypto_data.items():
-            # Check if user already exists
-            result = await db.execute(select(User).where(User.username == username))
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                print(f"Skipping {username}: already exists in database")
-                skipped += 1
-                continue
-
-            try:
-                # Create user with migration flag
-                user = User(
-                    username=username,
-                    salt=user_data.get('salt', ''),
-                    password_hash=user_data.get('password_hash', ''),
-                    encrypted_private_key=user_data.get('encrypted_private_key', ''),
-                    public_key=user_data.get('public_key', ''),
-                    requires_key_migration=True,  # Mark for key re-encryption on first login
-                )
-
-                db.add(user)
-                print(f"Migrating user: {username}")
-                migrated += 1
-
-            except Exception as e:
-                print(f"Error migrating {username}: {e}")
-
-        await db.commit()
-        print(f"\nMigration complete: {migrated} migrated, {skipped} skipped")
+        with open(crypto_path, 'rb') as f:
+            batch = {}
+            # Stream top-level {username: user_data} entries instead of loading the whole file
+            for username, user_data in ijson.kvitems(f, ''):
+                batch[username] = user_data
+                if len(batch) >= BATCH_SIZE:
+                    done, seen = await _migrate_batch(db, batch)
+                    migrated += done
+                    skipped += seen
+                    batch = {}
+            if batch:
+                done, seen = await _migrate_batch(db, batch)
+                migrated += done
+                skipped += seen
+
+    print(f"\nMigration complete: {migrated} migrated, {skipped} skipped")
 
 
 if __name__ == "__main__":